@@ -0,0 +1,28 @@
+# src/_kernels.py
+import numpy as np
+from numba import njit
+
+#--------------------------------------------------------------------------------------------------------------------------------------------#
+# NUMERICAL KERNELS
+# JIT compiled cores for the regression code in analyze.py. They take raw contiguous float64 arrays only (no pandas objects).
+# Compiled lazily on the first call; cache=True keeps the machine code on disk so later runs skip compilation.
+#--------------------------------------------------------------------------------------------------------------------------------------------#
+
+@njit(cache=True, fastmath=True)
+def ols_hc1(X, y):
+    """
+    Least squares fit via QR plus the HC1 (robust) covariance matrix.
+    X must already include the intercept column. Returns (beta, cov_hc1).
+    """
+    n, k = X.shape
+    Q, R = np.linalg.qr(X)
+    Qt = np.ascontiguousarray(Q.T)
+    Rt = np.ascontiguousarray(R.T)
+    beta = np.linalg.solve(R, np.dot(Qt, y))
+    e = y - np.dot(X, beta)
+
+    # Sandwich estimator: bread = (X'X)^-1, meat = X' diag(e^2) X
+    XtX_inv = np.linalg.inv(np.dot(Rt, R))
+    meat = np.dot(X.T, X * (e**2).reshape(-1, 1))
+    cov = (n / (n - k)) * np.dot(np.dot(XtX_inv, meat), XtX_inv)
+    return beta, cov
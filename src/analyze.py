@@ -1,16 +1,30 @@
 # src/analyze.py
+from collections import namedtuple
+import numpy as np
 import pandas as pd
-import statsmodels.api as sm
-from sklearn.cluster import KMeans
+from sklearn.cluster import MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
+import matplotlib
+matplotlib.use('Agg') # Headless backend: we only ever write PNG files
 import matplotlib.pyplot as plt
 import seaborn as sns
+from ._kernels import ols_hc1
 
 #--------------------------------------------------------------------------------------------------------------------------------------------#
 # ANALYSIS & VISUALIZATION MODULE
 # Contains the core statistical models and plotting functions.
 #--------------------------------------------------------------------------------------------------------------------------------------------#
 
+def _numeric_view(df, cols, dtype=np.float64):
+    """
+    Returns only the requested columns as floats (float64 unless another dtype is asked for). load.py already
+    delivers numeric dtypes, so the (slow) pd.to_numeric pass only runs for columns that did not arrive numeric.
+    """
+    d = df[cols]
+    if not all(pd.api.types.is_numeric_dtype(d[c]) for c in cols):
+        d = d.apply(pd.to_numeric, errors='coerce')
+    return d.astype(dtype, copy=False)
+
 # --- STATISTICAL CHECKS ---
 
 def check_multicollinearity(df, features):
@@ -18,27 +32,46 @@ def check_multicollinearity(df, features):
     Calculates Variance Inflation Factor (VIF). If VIF is =1 NO multicollinearity is found amongst variables.
     VIF >5 OR >10, multicollinearity is present and we need to regress each variable against CES Score individually.
     After dropping median income, VIF is around 1 for all variables.
+    The table is printed and also returned (feature, VIF); features in an exact linear dependency get inf.
     """
-    from statsmodels.stats.outliers_influence import variance_inflation_factor
-    
-    d = df[features].copy()
-    for col in features:
-        d[col] = pd.to_numeric(d[col], errors='coerce')
-    d = d.dropna()
-    
-    if d.empty: return
+    d = _numeric_view(df, features).dropna().to_numpy()
+    
+    if len(d) < 2: return
+    
+    # VIF_j = 1 / (1 - R_j^2) is the j-th diagonal entry of the inverse correlation matrix,
+    # so a single inversion replaces one auxiliary regression per feature (no intercept row needed)
+    vifs = np.full(len(features), np.inf)
+    # A constant column is perfectly collinear with the intercept: its VIF is infinite and it has no correlations,
+    # so it is left out of the matrix (atleast_2d keeps a single feature as a 1x1 matrix)
+    varies = d.std(axis=0) > 0
+    if varies.any():
+        C = np.atleast_2d(np.corrcoef(d[:, varies], rowvar=False))
+        
+        # Exact linear dependencies show up as (numerically) zero eigenvalues. inv() doesn't reliably raise on them and
+        # returns huge values of either sign, so the features taking part in a dependency are reported as inf and the
+        # pseudo-inverse gives the VIF of everything else (it equals the inverse when nothing is dependent)
+        w, V = np.linalg.eigh(C)
+        null = w <= w.max() * len(w) * np.finfo(float).eps
+        dependent = (np.abs(V[:, null]) > 1e-8).any(axis=1)
+        diag = np.diag(np.linalg.pinv(C, hermitian=True))
+        
+        # A VIF is >= 1 by definition; anything else here is a numerical artifact of a dependency
+        bad = dependent | ~np.isfinite(diag) | (diag < 1)
+        vifs[varies] = np.where(bad, np.inf, diag)
     
-    X = sm.add_constant(d)
-    vif = pd.DataFrame()
-    vif["feature"] = X.columns
-    vif["VIF"] = [variance_inflation_factor(X.values, i) for i in range(X.shape[1])]
+    vif = pd.DataFrame({"feature": features, "VIF": vifs})
     
     print("\n--- Multicollinearity Check (VIF) ---")
     print(vif.round(2))
+    return vif
 
 
 #  --- ANALYSIS TOOLS ---
 
+# Lightweight regression result carrying only the fields the pipeline reads,
+# plus the design matrix (exog) and outcome (endog) so format_ols_results can rebuild the full statsmodels summary
+OLSResult = namedtuple("OLSResult", ["params", "bse", "resid", "rsquared", "nobs", "y", "exog", "endog"])
+
 def run_ols(df, y, x):
     """
     Runs an Ordinary Least Squares (OLS) regression
@@ -50,26 +83,122 @@ def run_ols(df, y, x):
     This is standard practice for geographic data because variance usually changes 
     across different regions, especially significant in LA County where income disparities are high
     """
-    d = df.copy()
-    cols_to_process = [y] + x
-    for col in cols_to_process:
-        if col in d.columns:
-            d[col] = pd.to_numeric(d[col], errors='coerce')
-    
-    d = d.dropna(subset=cols_to_process)
+    d = _numeric_view(df, [y] + x).dropna()
     
     if len(d) < 20: 
         print(f"Not enough valid data for regression (n={len(d)}). Check your input columns.")
         return None
     
     try:
-        X = sm.add_constant(d[x])
-        model = sm.OLS(d[y], X).fit(cov_type='HC1')
-        return model
+        n = len(d)
+        X = np.ascontiguousarray(np.column_stack([np.ones(n), d[x].to_numpy(dtype=np.float64)]))
+        yv = np.ascontiguousarray(d[y].to_numpy(dtype=np.float64))
+        
+        # QR solve + HC1 sandwich, JIT compiled in _kernels.py
+        # Kept in float64: median income (~1e5) sits next to rates < 1, and the (X'X)^-1 bread squares that condition number
+        beta, cov = ols_hc1(X, yv)
+        e = yv - X @ beta
+        
+        names = ["const"] + list(x)
+        rsquared = 1 - (e @ e) / np.sum((yv - yv.mean())**2)
+        return OLSResult(
+            params=pd.Series(beta, index=names),
+            bse=pd.Series(np.sqrt(np.diag(cov)), index=names),
+            resid=e,
+            rsquared=rsquared,
+            nobs=n,
+            y=y,
+            exog=pd.DataFrame(X, columns=names, index=d.index),
+            endog=d[y],
+        )
     except Exception as e:
         print(f"Regression failed: {e}")
         return None
 
+# Coefficients-only result for run_ols_fast (no covariance, no residuals)
+OLSFit = namedtuple("OLSFit", ["params", "rsquared", "nobs"])
+
+def run_ols_fast(df, y, x):
+    """
+    Point-estimate-only OLS for when we just need coefficients and R^2 (e.g. refitting many subsets).
+    Skips the HC1 sandwich entirely: a NaN mask plus one numpy lstsq call.
+    Same input handling as run_ols (numeric coercion, NaN rows dropped, at least 20 rows).
+    Use run_ols when standard errors / the results table are needed.
+    """
+    d = _numeric_view(df, [y] + x).dropna()
+    
+    if len(d) < 20: 
+        print(f"Not enough valid data for regression (n={len(d)}). Check your input columns.")
+        return None
+
+    n = len(d)
+    Xm = np.column_stack([np.ones(n), d[x].to_numpy()])
+    yv = d[y].to_numpy()
+    beta, *_ = np.linalg.lstsq(Xm, yv, rcond=None)
+    e = yv - Xm @ beta
+
+    return OLSFit(
+        params=pd.Series(beta, index=["const"] + list(x)),
+        rsquared=1 - (e @ e) / np.sum((yv - yv.mean())**2),
+        nobs=n,
+    )
+
+def run_ols_multi_y(df, y_cols, x):
+    """
+    Fits the same regressors against several outcomes (coefficients and R^2 only).
+    Outcomes that are observed on exactly the same rows share one design matrix, so they are stacked into
+    an (n, k) Y matrix and solved with ONE lstsq call. Outcomes with different missing rows (e.g. per-cluster copies
+    of y, NaN outside their cluster) each get the rows they actually have.
+    
+    Returns (params DataFrame indexed by ["const"] + x with one column per outcome, rsquared Series), or None.
+    Outcomes with fewer than 20 usable rows are left as NaN.
+    """
+    y_cols = list(y_cols)
+    X = _numeric_view(df, x).to_numpy()
+    Y = _numeric_view(df, y_cols).to_numpy()
+    x_ok = ~np.isnan(X).any(axis=1)
+
+    B = np.full((len(x) + 1, len(y_cols)), np.nan)
+    r2 = np.full(len(y_cols), np.nan)
+
+    # Group the outcome columns by their missing-value pattern: one solve per distinct pattern
+    patterns, group = np.unique(~np.isnan(Y), axis=1, return_inverse=True)
+    group = group.ravel()
+    for g in range(patterns.shape[1]):
+        cols = np.flatnonzero(group == g)
+        rows = x_ok & patterns[:, g]
+        n = int(rows.sum())
+        if n < 20:
+            print(f"Not enough valid data for regression of {[y_cols[c] for c in cols]} (n={n}). Skipping.")
+            continue
+        
+        Xm = np.column_stack([np.ones(n), X[rows]])
+        Yg = Y[rows][:, cols]
+        Bg, *_ = np.linalg.lstsq(Xm, Yg, rcond=None)
+        E = Yg - Xm @ Bg
+        B[:, cols] = Bg
+        r2[cols] = 1 - (E**2).sum(axis=0) / ((Yg - Yg.mean(axis=0))**2).sum(axis=0)
+
+    if np.isnan(r2).all():
+        print("Not enough valid data for any of the regressions. Check your input columns.")
+        return None
+
+    params = pd.DataFrame(B, index=["const"] + list(x), columns=y_cols)
+    return params, pd.Series(r2, index=y_cols)
+
+def format_ols_results(model):
+    """
+    Returns the full statsmodels summary text (model statistics, coefficient table, residual diagnostics, notes)
+    for an OLSResult, so regression_results.txt keeps exactly the layout of the published results.
+    
+    statsmodels is only needed here, for the one report we write; it is imported on demand so the analysis
+    itself (and every map worker that imports this module) doesn't pay for loading it.
+    """
+    import statsmodels.api as sm
+    
+    fit = sm.OLS(model.endog, model.exog).fit(cov_type='HC1')
+    return fit.summary().as_text()
+
 def add_clusters(df, cols, k=5):
     """
     Performs K-Means clustering to identify neighborhood typologies. 
@@ -79,50 +208,73 @@ def add_clusters(df, cols, k=5):
     
     Cluster 0 = Highest Pollution (Worst).  Maps to Red
     Cluster 4 = Lowest Pollution (Best) . Maps to Green
+    
+    The 'cluster' column is added to the input frame in place (and the frame is returned).
     """
-    d = df.copy()
-    for col in cols:
-        if col in d.columns:
-            d[col] = pd.to_numeric(d[col], errors='coerce')
-            
-    # Create an explicit copy to avoid SettingWithCopyWarning
-    fit_data = d.dropna(subset=cols).copy()
+    # Only the clustering columns (plus the ID) are pulled out; dropna returns a fresh frame we can add labels to.
+    # The features are cast straight to float32 (no float64 intermediate): K-Means distances are memory-bound and
+    # these demographics only carry a few significant digits
+    fit_data = _numeric_view(df, cols, np.float32).assign(GEOID=df["GEOID"]).dropna(subset=cols)
     
     if len(fit_data) < 20: 
         print("Not enough data to cluster.")
         return df
         
-    # We must scale the data using Z-score normalization before clustering
-    scaler = StandardScaler()
-    s = scaler.fit_transform(fit_data[cols])
+    # We must scale the data using Z-score normalization before clustering (in place, sklearn keeps float32 input in 32-bit)
+    scaler = StandardScaler(copy=False)
+    s = scaler.fit_transform(fit_data[cols].to_numpy(dtype=np.float32))
     
-    km = KMeans(n_clusters=k, random_state=42).fit(s)
+    # Mini-batch K-Means converges in a fraction of the full Lloyd iterations with comparable clusters at k=5.
+    # 1024-row batches (sklearn's default) keep every BLAS call large enough to use all cores and need fewer steps per epoch
+    km = MiniBatchKMeans(n_clusters=k, random_state=42, batch_size=1024, n_init=3, max_iter=100).fit(s)
     raw_labels = km.labels_
     
     # --- SORTING STEPS ---
-    # 1. Attach temporary labels using .loc to prevent warnings
-    fit_data.loc[:, 'temp_label'] = raw_labels
-    
-    # 2. Identify which variable to sort by (Prefer CES Score for "Badness")
+    # 1. Identify which variable to sort by (Prefer CES Score for "Badness")
     sort_col = 'ces_score' if 'ces_score' in cols else cols[0]
+    scores = fit_data[sort_col].to_numpy()
     
-    # 3. Calculate mean score for each cluster and sort descending (High score = Bad)
-    # This gives us an order: Index 0 is the worst cluster, Index 4 is the best
-    means = fit_data.groupby('temp_label')[sort_col].mean().sort_values(ascending=False)
+    # 2. Calculate mean score for each cluster (sum of scores / count per label) 
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.bincount(raw_labels, weights=scores, minlength=k) / np.bincount(raw_labels, minlength=k)
+    
+    # 3. Sort descending (High score = Bad). This gives us an order: position 0 is the worst cluster, position 4 is the best
+    order = np.argsort(-means)
     
     # 4. Create a mapping from Old Random Label -> New Sorted Label (0..4)
     # 0 will be the "Worst" (Highest CES), 4 will be "Best" (Lowest CES)
-    mapping = {old_lbl: new_rank for new_rank, old_lbl in enumerate(means.index)}
-    
-    # 5. Apply the mapping using .loc
-    fit_data.loc[:, "cluster"] = fit_data['temp_label'].map(mapping).astype(int)
-    
-    # Merge back keeping all rows
-    return df.merge(fit_data[["GEOID", "cluster"]], on="GEOID", how="left")
+    mapping = np.empty(k, dtype=int)
+    mapping[order] = np.arange(k)
+    
+    # 5. Apply the mapping
+    fit_data["cluster"] = mapping[raw_labels]
+    
+    # Attach labels to all rows by GEOID (tracts dropped for missing data get NaN).
+    # A keyed map writes a single column instead of copying the whole frame through a merge
+    # (GEOID may be categorical; looking up the raw values keeps 'cluster' a plain numeric column)
+    cluster_by_geoid = pd.Series(fit_data["cluster"].to_numpy(), index=fit_data["GEOID"].to_numpy())
+    df["cluster"] = cluster_by_geoid.reindex(df["GEOID"].to_numpy()).to_numpy()
+    return df
 
 # --- VISUALIZATION TOOLS ---
+# Every plotting function accepts an optional 'ax'. If one is passed, it is cleared and reused (so a batch of maps can share
+# one Figure); otherwise the function creates its own figure and closes it when done.
+
+def _prepare_axes(ax, figsize):
+    """Returns (fig, ax, owns_figure), reusing the given axes when possible."""
+    if ax is None:
+        fig, ax = plt.subplots(1, 1, figsize=figsize)
+        return fig, ax, True
+    ax.clear()
+    return ax.figure, ax, False
+
+def _save_figure(fig, out_path, owns_figure):
+    # bbox_inches='tight' trims the margins at save time, no separate tight_layout() pass needed
+    fig.savefig(out_path, dpi=100, bbox_inches='tight')
+    if owns_figure:
+        plt.close(fig)
 
-def save_boxplot_comparison(df, out_path):
+def save_boxplot_comparison(df, out_path, ax=None):
     """
     Creates a boxplot comparing CES Scores between tracts that have bike lanes
     vs tracts that do not.
@@ -130,25 +282,24 @@ def save_boxplot_comparison(df, out_path):
     This visualizes the 'Infrastructure Gap'. Answers the question 'Are bike lanes serving the 
     most polluted communities, or are they concentrated in cleaner areas?'
     """
-    data = df.copy()
+    # Copy only the two columns we plot, not the whole master table
+    data = df[['bike_lane_density_sq_mi', 'ces_score']].copy()
     
     # Create a binary category (0 = No Lanes, 1 = Has Lanes)
     data['has_lanes'] = data['bike_lane_density_sq_mi'] > 0
     data = data.dropna(subset=['ces_score', 'has_lanes'])
     
-    plt.figure(figsize=(8, 6))
-    sns.boxplot(x='has_lanes', y='ces_score', data=data, palette="Set2")
+    fig, ax, owns_figure = _prepare_axes(ax, figsize=(8, 6))
+    sns.boxplot(x='has_lanes', y='ces_score', data=data, palette="Set2", ax=ax)
     
-    plt.xlabel("Presence of Bike Infrastructure", fontsize=12)
-    plt.ylabel("CalEnviroScreen 4.0 Score", fontsize=12)
-    plt.title("Distribution of Environmental Burden by Infrastructure Status", fontsize=14)
-    plt.xticks([0, 1], ["No Bike Lanes", "Has Bike Lanes"])
+    ax.set_xlabel("Presence of Bike Infrastructure", fontsize=12)
+    ax.set_ylabel("CalEnviroScreen 4.0 Score", fontsize=12)
+    ax.set_title("Distribution of Environmental Burden by Infrastructure Status", fontsize=14)
+    ax.set_xticks([0, 1], ["No Bike Lanes", "Has Bike Lanes"])
     
-    plt.tight_layout()
-    plt.savefig(out_path)
-    plt.close()
+    _save_figure(fig, out_path, owns_figure)
 
-def save_choropleth(gdf, column, out_path, title, cmap='viridis'):
+def save_choropleth(gdf, column, out_path, title, cmap='viridis', ax=None):
     """
     Generates a Choropleth (Heat) Map of Los Angeles County
     
@@ -156,16 +307,18 @@ def save_choropleth(gdf, column, out_path, title, cmap='viridis'):
     - cmap: The color map to use 
       'RdYlGn' (Red-Yellow-Green) is good for "More is Better".
       'RdYlGn_r' (Reversed) is good for "More is Bad" (e.g. pollution)
+    - ax: Optional axes to draw on (cleared first), e.g. shared across several maps
     
     We use 'Quantile' classification to ensure the colors are evenly distributed,
     making it easier to see high/low patterns across the map.
     """
     if column not in gdf.columns: return
 
-    fig, ax = plt.subplots(1, 1, figsize=(12, 10))
+    fig, ax, owns_figure = _prepare_axes(ax, figsize=(12, 10))
     
-    # Ensure data is numeric
-    gdf[column] = pd.to_numeric(gdf[column], errors='coerce')
+    # Ensure data is numeric (already the case for columns produced by load.py / process.py)
+    if not pd.api.types.is_numeric_dtype(gdf[column]):
+        gdf[column] = pd.to_numeric(gdf[column], errors='coerce')
     
     gdf.plot(
         column=column, 
@@ -177,11 +330,10 @@ def save_choropleth(gdf, column, out_path, title, cmap='viridis'):
     )
     
     ax.set_axis_off()
-    plt.title(title, fontsize=16, fontweight='bold')
-    plt.savefig(out_path)
-    plt.close()
+    ax.set_title(title, fontsize=16, fontweight='bold')
+    _save_figure(fig, out_path, owns_figure)
 
-def save_cluster_map(gdf, out_path):
+def save_cluster_map(gdf, out_path, ax=None):
     """
     Maps the K-Means clusters.
     
@@ -192,10 +344,11 @@ def save_cluster_map(gdf, out_path):
     """
     if "cluster" not in gdf.columns: return
 
-    fig, ax = plt.subplots(1, 1, figsize=(12, 10))
+    fig, ax, owns_figure = _prepare_axes(ax, figsize=(12, 10))
     
     # Ensure cluster is numeric for the gradient colormap to work correctly
-    gdf["cluster"] = pd.to_numeric(gdf["cluster"], errors='coerce')
+    if not pd.api.types.is_numeric_dtype(gdf["cluster"]):
+        gdf["cluster"] = pd.to_numeric(gdf["cluster"], errors='coerce')
     
     gdf.plot(
         column="cluster", 
@@ -207,6 +360,5 @@ def save_cluster_map(gdf, out_path):
     )
     
     ax.set_axis_off()
-    plt.title("Neighborhood Typologies (Sorted by Environmental Score)", fontsize=16)
-    plt.savefig(out_path)
-    plt.close()
+    ax.set_title("Neighborhood Typologies (Sorted by Environmental Score)", fontsize=16)
+    _save_figure(fig, out_path, owns_figure)
@@ -1,32 +1,48 @@
 # src/main.py
+import argparse
+import os
 from pathlib import Path
 from . import load, process, analyze
 from .config import PROJECT_ROOT
 import pandas as pd 
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 
-def main():
+def _map_layer(gdf, column):
+    """Just the polygons and the one column a map colors, so less data is pickled to the worker processes."""
+    return gdf[["GEOMETRY"] + ([column] if column in gdf.columns else [])]
+
+def _write_text(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+    return path
+
+def main(refresh=False):
+    """Runs the full pipeline. refresh=True re-downloads the ACS data and rebuilds the cached data bundle."""
     print("--- Starting Analysis Pipeline ---")
     
     # Setup the results directory to store all output maps, plots, and tables
     results_dir = PROJECT_ROOT / "results"
     results_dir.mkdir(parents=True, exist_ok=True)
 
+    # Table/text outputs are handed to a small thread pool, so the disk writes overlap the analysis and map rendering
+    # below (each task writes its own file, and pyarrow's CSV writer releases the GIL). Plots stay off this pool:
+    # pyplot is not thread-safe
+    writer = ThreadPoolExecutor(max_workers=4)
+    pending_writes = []
+
     # ---------------------------------------------------------
     # 1. LOAD DATA
     # ---------------------------------------------------------
-    print("Loading Demographic Data (ACS)...")
-    acs = load.fetch_acs_los_angeles()
-    
-    # We calculate the vehicle non-ownership rate here because it's a importanrt indicator of who needs bike infrastructure the most
-    acs = process.add_vehicle_rate(acs) 
-    load.save_acs(acs)
-
-    print("Loading Environmental Data (CES 4.0)...")
-    ces = load.load_calenviroscreen()
-
-    print("Loading Spatial Data (Tracts & Bikeways)...")
+    print("Loading Spatial Data (Tracts)...")
     tracts = load.load_census_tracts()
-    bike = load.load_bikeways()
+
+    # Demographics (ACS), Environment (CES 4.0) and Bikeways come from one cached bundle when the raw files are unchanged.
+    # The tracts we just loaded are reused for the bikeway intersection
+    print("Loading Demographic, Environmental & Bikeway Data...")
+    acs, ces, bike = load.load_or_cache(tracts, refresh=refresh)
+    pending_writes.append(writer.submit(load.save_acs, acs))
     
     # ---------------------------------------------------------
     # 2. PROCESS & MERGE
@@ -35,12 +51,16 @@ def main():
     # This combines our demographics, environment, and infrastructure data into a single master table keyed by Census Tract ID
     merged = process.merge_layers(acs, ces, bike, tracts) 
     
-    # Normalize bike lanes by area (Miles per Sq Mile) so large rural tracts
-    # don't skew the comparison against small urban tracts.
-    merged = process.add_bike_lane_area_density(merged)
+    # Derived variables, computed together in one pass:
+    # - Vehicle non-ownership rate, an important indicator of who needs bike infrastructure the most
+    # - Bike lanes per 1,000 residents
+    # - Bike lanes normalized by area (Miles per Sq Mile) so large rural tracts
+    #   don't skew the comparison against small urban tracts.
+    merged = process.add_derived_metrics(merged)
     
     # Save the clean dataset for transparency
-    process.save_master(merged)
+    # (a shallow copy: add_clusters adds a column to 'merged' while this may still be writing)
+    pending_writes.append(writer.submit(process.save_master, merged.copy(deep=False)))
 
     # ---------------------------------------------------------
     # 3. STATISTICAL ANALYSIS
@@ -55,9 +75,9 @@ def main():
     )
     
     if model:
-        with open(results_dir / "regression_results.txt", "w") as f:
-            f.write(model.summary().as_text())
-        print("Regression results saved.")
+        pending_writes.append(
+            writer.submit(_write_text, results_dir / "regression_results.txt", analyze.format_ols_results(model))
+        )
 
     # ---------------------------------------------------------
     # 4. CLUSTERING
@@ -71,8 +91,7 @@ def main():
     # We save a specific file for the clusters as requested
     # This file includes the Tract ID, the Cluster Label (0-4), and the variables used
     cluster_out = results_dir / "neighborhood_clusters.csv"
-    merged[["GEOID", "cluster"] + cluster_cols].to_csv(cluster_out, index=False)
-    print(f"Cluster assignments saved to: {cluster_out}")
+    pending_writes.append(writer.submit(load.write_csv, merged[["GEOID", "cluster"] + cluster_cols], cluster_out))
 
     # ---------------------------------------------------------
     # 5. VISUALIZATION
@@ -82,44 +101,67 @@ def main():
     # We need to re-attach the polygon shapes to our data to make maps
     gdf = process.attach_geometry(tracts, merged)
     
-    # A. Box Plot
-    # Shows if bike lanes are generally in areas with cleaner or dirtier air
-    analyze.save_boxplot_comparison(merged, results_dir / "boxplot_density_vs_ces.png")
-    
     # B. Maps (Using custom  red-green color code for easier interpretation)
+    # The four maps share no state, so they are rendered in parallel worker processes. 'spawn' gives every worker
+    # a fresh matplotlib state, and each job only ships the polygons plus the one column it colors
+    map_jobs = [
+        # Bike Density: Red = Low Density (Bad), Green = High Density (Good)
+        partial(
+            analyze.save_choropleth,
+            _map_layer(gdf, "bike_lane_density_sq_mi"),
+            "bike_lane_density_sq_mi",
+            results_dir / "map_bike_density.png",
+            "Bike Lane Density (Miles/Sq Mi)",
+            cmap="RdYlGn",
+        ),
+        # CES Score: Green = Low Pollution (Good), Red = High Pollution (Bad)
+        # Note: 'RdYlGn_r' reverses the color scale so high numbers are Red
+        partial(
+            analyze.save_choropleth,
+            _map_layer(gdf, "ces_score"),
+            "ces_score",
+            results_dir / "map_ces_score.png",
+            "CalEnviroScreen 4.0 Score",
+            cmap="RdYlGn_r",
+        ),
+        # Vehicle Rate: Green = Low % No-Car (Good access), Red = High % No-Car (transit dependence)
+        partial(
+            analyze.save_choropleth,
+            _map_layer(gdf, "vehicle_rate"),
+            "vehicle_rate",
+            results_dir / "map_vehicle_rate.png",
+            "Households without Vehicle Access (%)",
+            cmap="RdYlGn_r",
+        ),
+        # Clusters: Sorted Gradient (Red=Worst -> Green=Best)
+        partial(analyze.save_cluster_map, _map_layer(gdf, "cluster"), results_dir / "map_clusters.png"),
+    ]
+
+    # A. Box Plot (drawn here while the workers render the maps)
+    # Shows if bike lanes are generally in areas with cleaner or dirtier air
+    boxplot_path = results_dir / "boxplot_density_vs_ces.png"
+
+    # Each spawned worker re-imports the analysis stack (~2s), which only pays off with spare cores
+    n_workers = min(len(map_jobs), os.cpu_count() or 1)
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(job) for job in map_jobs]
+            analyze.save_boxplot_comparison(merged, boxplot_path)
+            for future in futures:
+                future.result()
+    else:
+        analyze.save_boxplot_comparison(merged, boxplot_path)
+        for job in map_jobs:
+            job()
     
-    # Bike Density: Red = Low Density (Bad), Green = High Density (Good)
-    analyze.save_choropleth(
-        gdf, 
-        "bike_lane_density_sq_mi", 
-        results_dir / "map_bike_density.png", 
-        "Bike Lane Density (Miles/Sq Mi)",
-        cmap="RdYlGn"
-    )
-    
-    # CES Score: Green = Low Pollution (Good), Red = High Pollution (Bad)
-    # Note: 'RdYlGn_r' reverses the color scale so high numbers are Red
-    analyze.save_choropleth(
-        gdf, 
-        "ces_score", 
-        results_dir / "map_ces_score.png", 
-        "CalEnviroScreen 4.0 Score",
-        cmap="RdYlGn_r"
-    )
-    
-    # Vehicle Rate: Green = Low % No-Car (Good access), Red = High % No-Car (transit dependence)
-    analyze.save_choropleth(
-        gdf, 
-        "vehicle_rate", 
-        results_dir / "map_vehicle_rate.png", 
-        "Households without Vehicle Access (%)",
-        cmap="RdYlGn_r"
-    )
-    
-    # Clusters: Sorted Gradient (Red=Worst -> Green=Best)
-    analyze.save_cluster_map(gdf, results_dir / "map_clusters.png")
-    
+    # Make sure every table reached disk (and surface any write error) before reporting success
+    for future in pending_writes:
+        print(f"Saved: {future.result()}")
+    writer.shutdown()
+
     print("--- Pipeline Complete ---")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="LA bike lane vs. environmental burden analysis pipeline")
+    parser.add_argument("--refresh", action="store_true", help="re-download the ACS data instead of using the local cache")
+    main(refresh=parser.parse_args().refresh)
@@ -1,13 +1,33 @@
 
 # src/process.py
+import numpy as np
 import pandas as pd
-from .load import get_processed_dir
+from .load import get_processed_dir, write_csv
 import geopandas as gpd
 
 #--------------------------------------------------------------------------------------------------------------------------------------------#
 # DATA PROCESSING MODULE
 # Contains logic for how we operationalized and computed variables and merged datasets
 #--------------------------------------------------------------------------------------------------------------------------------------------#
+def _nan_if_zero(values):
+    """
+    Float64 array with zeros replaced by NaN, used as a safe denominator.
+    Unlike .replace(0, pd.NA) this keeps a plain float dtype, so the division stays a vectorized numpy loop
+    and a zero population/area yields NaN instead of a division error or an object column.
+    """
+    v = np.asarray(values, dtype=np.float64)
+    return np.where(v == 0, np.nan, v)
+
+def _per_sq_mi(miles, area):
+    """
+    miles / area into one preallocated float64 array. The where= mask skips tracts with a zero, negative
+    or missing area entirely, so they keep the NaN fill instead of producing inf.
+    """
+    area = np.asarray(area, dtype=np.float64)
+    out = np.full(area.shape, np.nan)
+    np.divide(np.asarray(miles, dtype=np.float64), area, out=out, where=(area > 0) & np.isfinite(area))
+    return out
+
 def add_vehicle_rate(df):
     """
     Calculates the 'Vehicle Rate', which is the percentage of households 
@@ -17,28 +37,22 @@ def add_vehicle_rate(df):
     High values suggest a population that relies on public transit, walking or biking, higlighting higher need for transit infrastructure 
     """
     #divide by population to normalize the rate across different tract sizes
-
-    r = df.copy()
-    if "households_no_vehicle" in r.columns and "population" in r.columns:
-        r["vehicle_rate"] = r["households_no_vehicle"] / r["population"].replace(0, pd.NA)
+    # assign returns a new frame that shares the untouched columns instead of deep-copying everything first
+    if "households_no_vehicle" in df.columns and "population" in df.columns:
+        rate = df["households_no_vehicle"].to_numpy(dtype=np.float64) / _nan_if_zero(df["population"])
     else:
-        r["vehicle_rate"] = pd.NA
-    return r
+        rate = np.nan
+    return df.assign(vehicle_rate=rate)
 
 def add_bikeway_per_capita(df):
     """
     Calculates bikeway miles per 1,000 residents.
     This is an 'Equity Metric' - showing how much infrastructure exists relative to the people served.
     """
-    r = df.copy()
-    if "bikeway_miles" not in r.columns:
-        r["bikeway_miles"] = 0.0
-    else:
-        r["bikeway_miles"] = r["bikeway_miles"].fillna(0.0)
+    miles = df["bikeway_miles"].fillna(0.0) if "bikeway_miles" in df.columns else 0.0
         
-    pop = r["population"].replace(0, pd.NA)
-    r["bikeway_miles_per_1000"] = (r["bikeway_miles"] / pop) * 1000
-    return r
+    pop = _nan_if_zero(df["population"])
+    return df.assign(bikeway_miles=miles, bikeway_miles_per_1000=(miles / pop) * 1000)
 
 def add_bike_lane_area_density(df):
     """
@@ -48,50 +62,84 @@ def add_bike_lane_area_density(df):
     We calculate this as comparing raw miles is unfair. Some tracts are huge (Valley) and some are tiny (downtown).
     Density normalizes the infrastructure availability by the physical size of the neighborhood.
     """
-    r = df.copy()
     # 1. Fill NaNs
-    if "bikeway_miles" not in r.columns:
-        r["bikeway_miles"] = 0.0
-    r["bikeway_miles"] = r["bikeway_miles"].fillna(0.0)
+    miles = df["bikeway_miles"].fillna(0.0) if "bikeway_miles" in df.columns else 0.0
     
     # 2. Check Area
-    if "tract_area_sq_mi" not in r.columns:
+    if "tract_area_sq_mi" not in df.columns:
         print("CRITICAL WARNING: 'tract_area_sq_mi' missing. Density will be NA.")
-        r["bike_lane_density_sq_mi"] = pd.NA
-        return r
+        return df.assign(bikeway_miles=miles, bike_lane_density_sq_mi=np.nan)
 
     # 3. Calculate
-    area_safe = r["tract_area_sq_mi"].replace(0, pd.NA)
-    r["bike_lane_density_sq_mi"] = r["bikeway_miles"] / area_safe
-    return r
+    return df.assign(bikeway_miles=miles, bike_lane_density_sq_mi=_per_sq_mi(miles, df["tract_area_sq_mi"]))
+
+def _geoid_indexed(df, geoid_dtype):
+    """Indexes df by GEOID in the shared categorical dtype, dropping IDs outside the master tract list (they would never join)."""
+    r = df.set_index(pd.CategoricalIndex(df["GEOID"], dtype=geoid_dtype)).drop(columns="GEOID")
+    return r[r.index.notna()]
+
+def add_derived_metrics(df):
+    """
+    Adds all three derived variables in a single pass over the merged table:
+    - vehicle_rate: households without a car / population ('Transit Dependency', see add_vehicle_rate)
+    - bikeway_miles_per_1000: bikeway miles per 1,000 residents ('Equity Metric', see add_bikeway_per_capita)
+    - bike_lane_density_sq_mi: bikeway miles per square mile ('Infrastructure Metric', see add_bike_lane_area_density)
+    
+    Each input column is read once as a numpy array, the zero-population / zero-area guard is computed once,
+    and the frame is copied once (by assign) instead of once per metric.
+    """
+    n = len(df)
+    def column(name):
+        return df[name].to_numpy(dtype=np.float64) if name in df.columns else np.full(n, np.nan)
+
+    pop_safe = _nan_if_zero(column("population"))
+    miles = np.nan_to_num(column("bikeway_miles")) # Missing miles means no bike lanes
+    
+    if "tract_area_sq_mi" in df.columns:
+        density = _per_sq_mi(miles, column("tract_area_sq_mi"))
+    else:
+        print("CRITICAL WARNING: 'tract_area_sq_mi' missing. Density will be NA.")
+        density = np.full(n, np.nan)
+    
+    return df.assign(
+        bikeway_miles=miles,
+        vehicle_rate=column("households_no_vehicle") / pop_safe,
+        bikeway_miles_per_1000=(miles / pop_safe) * 1000,
+        bike_lane_density_sq_mi=density,
+    )
+
+# CES columns kept in the master table: the dependent variable, PM2.5, and the percentile band for reference
+_CES_COLS = ["GEOID", "ces_score", "pm25", "ces_percentile_range"]
 
 def merge_layers(acs, ces, bike, tracts=None):
     """
     Merges the Demographic (ACS), Environmental (CES), and Infrastructure (Bike)
     dataframes into a single Master DataFrame for analysis.
     
-    Join Key: 'GEOID' (11-digit FIPS code)
+    Join Key: 'GEOID' (11-digit FIPS code), returned as a categorical column.
+    Every frame is indexed by ONE shared categorical GEOID dtype and all layers are attached in a single
+    left join, so the master index is hashed once and no intermediate merged frames are built.
     """
     print("Merging layers...")
-    m = acs.copy()
-    # Ensure Master GEOID is string
-    m["GEOID"] = m["GEOID"].astype(str)
+    # GEOID arrives as text from every loader (load._GEOID_DTYPE); build the shared categories from the master tract list
+    geoid_dtype = pd.CategoricalDtype(acs["GEOID"].unique())
+    m = acs.set_index(pd.CategoricalIndex(acs["GEOID"], dtype=geoid_dtype)).drop(columns="GEOID")
     
+    # Only carry the columns the analysis reads through the join (whatever else the loaders hand over stays behind)
+    layers = []
     if not ces.empty: 
-        ces["GEOID"] = ces["GEOID"].astype(str)
-        m = m.merge(ces, on="GEOID", how="left")
-    
+        layers.append(ces[[c for c in _CES_COLS if c in ces.columns]])
     if not bike.empty: 
-        # Ensure Bike GEOID is string to match Master, left join ensures we keep all demographic tracts even if they are missing environmental data
-        bike["GEOID"] = bike["GEOID"].astype(str)
-        m = m.merge(bike, on="GEOID", how="left")
-        # Bring in the tract area for density calculations
+        layers.append(bike[["GEOID", "bikeway_miles"]])
+    # Bring in the tract area for density calculations
     if tracts is not None and not tracts.empty:
         if 'tract_area_sq_mi' in tracts.columns:
-            tract_area = tracts[['GEOID', 'tract_area_sq_mi']].copy()
-            tract_area = tract_area.drop_duplicates(subset=['GEOID'])
-            tract_area["GEOID"] = tract_area["GEOID"].astype(str)
-            m = m.merge(tract_area, on="GEOID", how="left")
+            layers.append(tracts[['GEOID', 'tract_area_sq_mi']])
+    
+    # left join ensures we keep all demographic tracts even if they are missing environmental data
+    if layers:
+        m = m.join([_geoid_indexed(f, geoid_dtype) for f in layers], how="left")
+    m = m.rename_axis("GEOID").reset_index()
 
     # Final fill for miles
     if "bikeway_miles" in m.columns:
@@ -107,23 +155,18 @@ def attach_geometry(tracts, df):
     Re-joins the Master DataFrame with the polygon geometries.
     This creates a GeoDataFrame required for generating choropleth maps.
     """
-    r = df.copy()
-    r["GEOID"] = r["GEOID"].astype(str)
-    
-    geo_data = tracts[['GEOID', 'GEOMETRY']].copy()
-    geo_data = geo_data.drop_duplicates(subset=['GEOID'])
+    # Reuse the master table's categorical GEOID dtype (from merge_layers) so the join runs on integer codes
+    if isinstance(df["GEOID"].dtype, pd.CategoricalDtype):
+        geoid_dtype = df["GEOID"].dtype
+    else:
+        geoid_dtype = pd.CategoricalDtype(df["GEOID"].unique())
     
-    merged_gdf = geo_data.merge(r, on="GEOID", how="inner")
+    # Both sides are indexed by GEOID, so aligning polygons to attributes is a single indexed join (no merge copy)
+    geo_data = _geoid_indexed(tracts[['GEOID', 'GEOMETRY']], geoid_dtype)
+    out = geo_data.join(_geoid_indexed(df, geoid_dtype), how="inner")
     
-    if 'GEOMETRY' in merged_gdf.columns:
-        return gpd.GeoDataFrame(merged_gdf, geometry="GEOMETRY", crs=tracts.crs)
-    elif 'geometry' in merged_gdf.columns:
-        return gpd.GeoDataFrame(merged_gdf, geometry="geometry", crs=tracts.crs)
-        
-    return merged_gdf
+    return gpd.GeoDataFrame(out.rename_axis("GEOID").reset_index(), geometry="GEOMETRY", crs=tracts.crs)
 
 def save_master(df):
     """Saves the final clean dataset."""
-    path = get_processed_dir() / "master_analysis_data.csv"
-    df.to_csv(path, index=False)
-    return path
+    return write_csv(df, get_processed_dir() / "master_analysis_data.csv")
@@ -1,5 +1,6 @@
 # tests.py
 
+import numpy as np
 import pandas as pd
 import geopandas as gpd
 from pathlib import Path
@@ -83,6 +84,25 @@ def test_process_functions(acs, ces, bike):
     assert 'bikeway_miles_per_1000' in merged.columns, "Missing 'bikeway_miles_per_1000' column."
     
     print("  - Derived variables calculated successfully.")
+
+    # 3. Fused Metrics Test
+    # main.py computes the derived variables with add_derived_metrics only, so it must agree column by column with
+    # the single-metric helpers. Row 2 has zero population and row 3 zero area (both guards must give NaN, not inf)
+    syn = pd.DataFrame({
+        "GEOID": ["06037000100", "06037000200", "06037000300", "06037000400"],
+        "population": [1200.0, 850.0, 0.0, 400.0],
+        "households_no_vehicle": [60.0, 0.0, 5.0, 20.0],
+        "bikeway_miles": [1.5, np.nan, 2.0, 0.75],
+        "tract_area_sq_mi": [0.8, 1.2, 0.5, 0.0],
+    })
+    fused = process.add_derived_metrics(syn)
+    single = process.add_bike_lane_area_density(process.add_bikeway_per_capita(process.add_vehicle_rate(syn)))
+    for col in ["bikeway_miles", "vehicle_rate", "bikeway_miles_per_1000", "bike_lane_density_sq_mi"]:
+        assert np.allclose(fused[col], single[col], equal_nan=True), f"add_derived_metrics differs on '{col}'."
+    assert np.isnan(fused.loc[2, "vehicle_rate"]) and np.isnan(fused.loc[2, "bikeway_miles_per_1000"]), \
+        "Zero population should give NaN rates."
+    assert np.isnan(fused.loc[3, "bike_lane_density_sq_mi"]), "Zero area should give NaN density."
+    print("  - Fused derived metrics match the single-metric helpers.")
     return merged
 
 def test_analysis_functions(gdf):
@@ -103,6 +123,54 @@ def test_analysis_functions(gdf):
         # Check if R-squared exists (implies model ran)
         print(f"  - OLS regression ran successfully (R-squared: {model.rsquared:.4f}).")
 
+    # --- OLS Estimator Check (synthetic data) ---
+    # run_ols is a hand-written QR + HC1 estimator, so pin it against the textbook formulas on known data:
+    # beta = lstsq(X, y), robust cov = n/(n-k) (X'X)^-1 X' diag(e^2) X (X'X)^-1
+    rng = np.random.default_rng(0)
+    n = 200
+    syn = pd.DataFrame({"x1": rng.normal(size=n), "x2": rng.uniform(0, 1, n)})
+    syn["y"] = 2.0 - 0.5 * syn["x1"] + 3.0 * syn["x2"] + rng.normal(0, 1 + np.abs(syn["x1"]), n)
+    
+    syn_model = analyze.run_ols(syn, "y", ["x1", "x2"])
+    X = np.column_stack([np.ones(n), syn[["x1", "x2"]].to_numpy()])
+    beta, *_ = np.linalg.lstsq(X, syn["y"].to_numpy(), rcond=None)
+    e = syn["y"].to_numpy() - X @ beta
+    bread = np.linalg.inv(X.T @ X)
+    cov = n / (n - 3) * bread @ (X.T * e**2) @ X @ bread
+    
+    assert np.allclose(syn_model.params.to_numpy(), beta), "OLS coefficients do not match least squares."
+    assert np.allclose(syn_model.bse.to_numpy(), np.sqrt(np.diag(cov))), "Robust (HC1) standard errors are off."
+    assert "F-statistic:" in analyze.format_ols_results(syn_model), "Results table is missing the F-test."
+    print("  - OLS estimator matches the closed-form HC1 results.")
+
+    # The coefficients-only fast path must agree with the full fit (string-typed input is coerced the same way)
+    fast = analyze.run_ols_fast(syn.astype({"x2": str}), "y", ["x1", "x2"])
+    assert np.allclose(fast.params.to_numpy(), beta), "run_ols_fast coefficients differ from run_ols."
+    assert np.isclose(fast.rsquared, syn_model.rsquared), "run_ols_fast R-squared differs from run_ols."
+    assert analyze.run_ols_fast(syn.head(10), "y", ["x1", "x2"]) is None, "run_ols_fast should refuse n < 20."
+    print("  - Fast OLS path matches the full regression.")
+
+    # Multi-outcome fit: per-group copies of y (NaN outside their group) must match fitting each group on its own
+    group_a = syn["x1"] < 0
+    multi = syn.assign(y_a=syn["y"].where(group_a), y_b=syn["y"].where(~group_a))
+    params, r2 = analyze.run_ols_multi_y(multi, ["y", "y_a", "y_b"], ["x1", "x2"])
+    assert np.allclose(params["y"].to_numpy(), beta), "run_ols_multi_y differs from run_ols on the full sample."
+    for col, rows in (("y_a", group_a), ("y_b", ~group_a)):
+        sub = analyze.run_ols_fast(syn[rows], "y", ["x1", "x2"])
+        assert np.allclose(params[col].to_numpy(), sub.params.to_numpy()), f"run_ols_multi_y is off for {col}."
+        assert np.isclose(r2[col], sub.rsquared), f"run_ols_multi_y R-squared is off for {col}."
+    print("  - Multi-outcome OLS matches the per-group fits.")
+
+    # --- VIF Test (synthetic data) ---
+    # d = a + b is an exact linear dependency: a, b and d must come out as inf (never negative), c keeps its real VIF of 1
+    vif_data = pd.DataFrame({"a": rng.normal(size=n), "b": rng.normal(size=n), "c": rng.normal(size=n)})
+    vif_data["d"] = vif_data["a"] + vif_data["b"]
+    vif = analyze.check_multicollinearity(vif_data, ["a", "b", "c", "d"]).set_index("feature")["VIF"]
+    assert np.isinf(vif[["a", "b", "d"]]).all(), "Collinear features should have an infinite VIF."
+    assert np.isclose(vif["c"], 1.0, atol=0.05), "An independent feature's VIF should stay near 1."
+    assert (vif >= 1).all(), "VIFs can never be below 1."
+    print("  - VIF check handles exactly collinear features.")
+
     # --- K-Means Clustering Test ---
     cluster_cols = ["bikeway_miles_per_1000", "ces_score", "pm25", "vehicle_rate"]
     gdf_clustered = analyze.add_clusters(gdf, cluster_cols, k=5)